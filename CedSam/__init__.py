@@ -1 +1,2 @@
-from CedSam.player import Player
\ No newline at end of file
+from CedSam.player import Player
+from CedSam.mcts import MCTSPlayer
@@ -0,0 +1,280 @@
+"""
+Bitboard representation of a RoPaSci 360 game state.
+
+Each of the 61 hexes is one bit (see CedSam.hexes). A state keeps one
+integer mask per side and token type, so occupancy checks and battles
+are a handful of AND/OR operations instead of list and dict scans.
+Every state also carries its Zobrist key (see CedSam.zobrist), and
+the key of its mirror image (see CedSam.symmetry), kept up to date as
+tokens move, are thrown or die.
+
+Stacked tokens of the same side and type share a single bit, so the
+masks track occupancy; how many tokens each stack holds is kept
+alongside them, so that tokens() gives a side's exact number of tokens.
+"""
+
+from CedSam.hexes import HEXES, HEX_BIT, NEIGHBOURS
+from CedSam.side import Upper
+from CedSam.symmetry import MIRROR_KEYS, MIRROR_STACK_KEYS
+from CedSam.zobrist import PIECE_KEYS, THROW_KEYS, STACK_KEYS, \
+                            position_key, mask_key
+
+# token types, matching the `kind` of Rock, Paper and Scissors
+ROCK, PAPER, SCISSORS = 0, 1, 2
+
+# type that each type beats, and type that beats each type
+ENEMY = (SCISSORS, ROCK, PAPER)
+AVOID = (PAPER, SCISSORS, ROCK)
+
+# side offsets into the mask list
+UPPER, LOWER = 0, 3
+
+# hex ids each side may throw onto, by the number of throws it has used:
+# Upper's n-th throw reaches n rows down from r = 4, Lower's n rows up
+THROW_ZONES = tuple(tuple(tuple(i for i, (r, q) in enumerate(HEXES) 
+                                if sign * r >= 4 - used) 
+                            for used in range(9)) 
+                    for sign in (1, -1))
+
+
+def slot(side, kind):
+    """
+    Index of the mask holding tokens of this side and type
+    """
+    return (UPPER if side is Upper else LOWER) + kind
+
+
+def kill_masks(rock, paper, scissors):
+    """
+    Given the hexes holding each token type (of either side),
+    return the hexes where rocks, papers and scissors die
+    """
+    return paper, scissors, rock
+
+
+class BitBoard():
+
+    def __init__(self, masks=None, throws=None, stacks=None):
+        self.masks = list(masks) if masks else [0] * 6
+        # number of throws used by [Upper, Lower]
+        self.throws = list(throws) if throws else [0, 0]
+        # (mask index, hex id) -> how many more tokens are stacked on
+        # the one the mask shows there, for hexes holding more than one
+        self.stacks = dict(stacks) if stacks else dict()
+        self.key = position_key(self.masks, self.throws)
+        self.mirror_key = position_key(self.masks, self.throws, MIRROR_KEYS)
+        for (index, hex_id), count in self.stacks.items():
+            self.key ^= STACK_KEYS[index][hex_id][count]
+            self.mirror_key ^= MIRROR_STACK_KEYS[index][hex_id][count]
+        # one record per move made, for unmake_move()
+        self.undo = list()
+
+    @classmethod
+    def from_tokens(cls, tokens, throws=None):
+        """
+        Build a state from a list of Rock / Paper / Scissors tokens
+        """
+        masks = [0] * 6
+        stacks = dict()
+        for token in tokens:
+            index = slot(token.side, token.kind)
+            if masks[index] & HEX_BIT[token.hex]:
+                stacks[(index, token.hex)] = \
+                    stacks.get((index, token.hex), 0) + 1
+            masks[index] |= HEX_BIT[token.hex]
+        return cls(masks, throws, stacks)
+
+    # set how many more tokens are stacked on the one on a hex
+    def restack(self, index, hex_id, count):
+        old = self.stacks.get((index, hex_id), 0)
+        self.key ^= STACK_KEYS[index][hex_id][old] ^ \
+                    STACK_KEYS[index][hex_id][count]
+        self.mirror_key ^= MIRROR_STACK_KEYS[index][hex_id][old] ^ \
+                            MIRROR_STACK_KEYS[index][hex_id][count]
+        if count:
+            self.stacks[(index, hex_id)] = count
+        else:
+            del self.stacks[(index, hex_id)]
+
+    # put a token on a hex
+    def place(self, index, hex_id):
+        bit = HEX_BIT[hex_id]
+        if self.masks[index] & bit:
+            self.restack(index, hex_id, 
+                            self.stacks.get((index, hex_id), 0) + 1)
+        else:
+            self.masks[index] |= bit
+            self.key ^= PIECE_KEYS[index][hex_id]
+            self.mirror_key ^= MIRROR_KEYS[index][hex_id]
+
+    # take a token off a hex, leaving the hex set while others stay
+    def remove(self, index, hex_id):
+        bit = HEX_BIT[hex_id]
+        if (index, hex_id) in self.stacks:
+            self.restack(index, hex_id, self.stacks[(index, hex_id)] - 1)
+        elif self.masks[index] & bit:
+            self.masks[index] &= ~bit
+            self.key ^= PIECE_KEYS[index][hex_id]
+            self.mirror_key ^= MIRROR_KEYS[index][hex_id]
+
+    # slide / swing a token between two hexes
+    def move(self, index, src, dst):
+        self.remove(index, src)
+        self.place(index, dst)
+
+    # throw a new token onto a hex, using up one of the side's throws
+    def throw(self, index, hex_id):
+        side = index // 3
+        keys = THROW_KEYS[side]
+        change = keys[self.throws[side]] ^ keys[self.throws[side] + 1]
+        self.key ^= change
+        self.mirror_key ^= change
+        self.throws[side] += 1
+        self.place(index, hex_id)
+
+    def make_move(self, moves, battle=True):
+        """
+        Play a tuple of (index, src, dst) token moves at once, then
+        resolve battles unless told not to. A move with src None is a 
+        throw onto dst. Pushes everything needed to take the moves back 
+        onto the undo stack.
+        Returns the masks of the tokens that died (None without battle).
+        """
+        masks = self.masks
+        keys = (self.key, self.mirror_key, 
+                dict(self.stacks) if self.stacks else None)
+        priors = tuple(masks[index] for (index, src, dst) in moves)
+        for (index, src, dst) in moves:
+            if src is None:
+                self.throw(index, dst)
+            else:
+                self.move(index, src, dst)
+        killed = self.battle() if battle else None
+        self.undo.append((moves, priors, killed, keys))
+        return killed
+
+    def unmake_move(self):
+        """
+        Take back the last make_move(), bringing the captured tokens back
+        """
+        moves, priors, killed, keys = self.undo.pop()
+        masks = self.masks
+        if killed:
+            for i in range(6):
+                masks[i] |= killed[i]
+        for i in range(len(moves) - 1, -1, -1):
+            index, src, dst = moves[i]
+            masks[index] = priors[i]
+            if src is None:
+                self.throws[index // 3] -= 1
+        self.key, self.mirror_key, stacks = keys
+        self.stacks = stacks or dict()
+
+    def actions(self, side, throws=True):
+        """
+        Every action open to a side (0 for Upper, 1 for Lower), as 
+        (index, src, dst) moves for make_move(): slides and swings of 
+        each of its tokens, then (unless throws is False) throws of 
+        each type into its zone
+        """
+        base = 3 * side
+        masks = self.masks
+        own = masks[base] | masks[base + 1] | masks[base + 2]
+        actions = list()
+        for index in range(base, base + 3):
+            mask = masks[index]
+            while mask:
+                low = mask & -mask
+                mask ^= low
+                src = low.bit_length() - 1
+                # slide to a neighbour, or swing round an adjacent ally
+                reach = set(NEIGHBOURS[src])
+                for ally in NEIGHBOURS[src]:
+                    if own & HEX_BIT[ally]:
+                        reach.update(NEIGHBOURS[ally])
+                reach.discard(src)
+                actions.extend((index, src, dst) for dst in sorted(reach))
+        used = self.throws[side]
+        if throws and used < 9:
+            actions.extend((index, None, dst) 
+                            for dst in THROW_ZONES[side][used] 
+                            for index in range(base, base + 3))
+        return actions
+
+    def result(self):
+        """
+        Outcome of the position under the referee's end of turn checks
+        on tokens and throws: 1 if Upper has won, -1 if Lower has, 0 for 
+        a draw, or None if the game goes on. Repeated positions and the 
+        turn limit are left to the caller.
+        """
+        masks = self.masks
+        upper_left = 9 - self.throws[0]
+        lower_left = 9 - self.throws[1]
+        upper = [kind for kind in range(3) if masks[UPPER + kind]]
+        lower = [kind for kind in range(3) if masks[LOWER + kind]]
+
+        # a token is invincible when nothing can ever come to beat it
+        upper_invincible = not lower_left and \
+                            any(AVOID[kind] not in lower for kind in upper)
+        lower_invincible = not upper_left and \
+                            any(AVOID[kind] not in upper for kind in lower)
+        upper_none = not upper_left and not upper
+        lower_none = not lower_left and not lower
+        upper_one = not upper_left and self.tokens(0) == 1
+        lower_one = not lower_left and self.tokens(1) == 1
+
+        if upper_none or lower_none:
+            return lower_none - upper_none
+        if upper_invincible and lower_invincible:
+            return 0
+        if upper_invincible and lower_one:
+            return 1
+        if lower_invincible and upper_one:
+            return -1
+        return None
+
+    def invincible(self, side):
+        """
+        Types of the side's (0 for Upper, 1 for Lower) tokens that 
+        nothing can stop: the opponent has no throws left and no token
+        of the type that beats them, and has tokens left for them to 
+        beat, so the game is decided in the side's favour
+        """
+        if self.throws[1 - side] < 9:
+            return []
+        masks = self.masks
+        base = 3 * side
+        other = 3 - base
+        return [kind for kind in range(3) if masks[base + kind] and 
+                not masks[other + AVOID[kind]] and masks[other + ENEMY[kind]]]
+
+    def tokens(self, side):
+        """
+        Number of tokens a side (0 for Upper, 1 for Lower) has on the 
+        board, stacked ones included
+        """
+        base = 3 * side
+        return sum(count for (index, hex_id), count in self.stacks.items() 
+                    if index // 3 == side) + \
+                sum(bin(self.masks[index]).count('1') 
+                    for index in range(base, base + 3))
+
+    def battle(self):
+        """
+        Resolve all battles on the board in place.
+        Returns the masks of the tokens that died, indexed like masks.
+        """
+        m = self.masks
+        dies = kill_masks(m[0] | m[3], m[1] | m[4], m[2] | m[5])
+        killed = [m[i] & dies[i % 3] for i in range(6)]
+        # every token on a hex dies with the one the mask shows
+        for (index, hex_id) in list(self.stacks):
+            if killed[index] & HEX_BIT[hex_id]:
+                self.restack(index, hex_id, 0)
+        for i in range(6):
+            if killed[i]:
+                m[i] &= ~killed[i]
+                self.key ^= mask_key(i, killed[i])
+                self.mirror_key ^= mask_key(i, killed[i], MIRROR_KEYS)
+        return killed
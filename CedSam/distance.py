@@ -0,0 +1,46 @@
+"""
+Distances between every pair of hexes, precomputed once and indexed
+by hex id (see CedSam.hexes).
+
+HEX_DIST and EUCLID_DIST are 61x61 NumPy matrices, with HEX_STEPS the
+hex distances as integers, for vectorised lookups over whole rows or 
+index arrays; hex_distance() and euclidean_distance() are plain-Python 
+lookups for single pairs.
+"""
+
+from math import sqrt
+import numpy as np
+from CedSam.hexes import HEXES
+
+def hex_metric(a, b):
+    a_r, a_q = a
+    b_r, b_q = b
+    return (abs(a_q - b_q) + abs(a_q + a_r - b_q - b_r) + abs(a_r - b_r)) / 2
+
+def euclidean_metric(a, b):
+    a_r, a_q = a
+    b_r, b_q = b
+    return sqrt((a_r - b_r)**2 + (a_q - b_q)**2 - ((a_r - b_r)*(a_q - b_q)))
+
+HEX_DIST = np.array([[hex_metric(a, b) for b in HEXES] for a in HEXES])
+EUCLID_DIST = np.array([[euclidean_metric(a, b) for b in HEXES] 
+                        for a in HEXES])
+# integer steps, so distances can index tables of per-distance values
+HEX_STEPS = HEX_DIST.astype(np.intp)
+
+# python copies of the matrices, since indexing numpy one element
+# at a time is slower than indexing nested tuples
+_HEX_ROWS = tuple(map(tuple, HEX_DIST.tolist()))
+_EUCLID_ROWS = tuple(map(tuple, EUCLID_DIST.tolist()))
+
+def hex_distance(a, b):
+    """
+    Hex (step) distance between hex ids a and b
+    """
+    return _HEX_ROWS[a][b]
+
+def euclidean_distance(a, b):
+    """
+    Straight-line distance between the centres of hex ids a and b
+    """
+    return _EUCLID_ROWS[a][b]
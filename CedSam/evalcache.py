@@ -0,0 +1,52 @@
+"""
+Memo of leaf evaluations for CedSam's lookahead.
+
+simple_eval and the utility matrices built from it only look at a few
+tokens: the two playing, and whatever stands on the hexes they can
+move to. Keying the memo by just those lets one evaluation serve every
+position that agrees on them, however the rest of the board differs.
+"""
+
+from collections import OrderedDict
+
+
+class EvalCache:
+    """
+    LRU-bounded memo of evaluations, with hit and miss counts kept
+    over its lifetime (a game, for a Player's caches)
+    """
+
+    def __init__(self, maxsize=1 << 16):
+        self.maxsize = maxsize
+        self.values = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        """
+        The value stored for key, or None if there is none
+        """
+        value = self.values.get(key)
+        if value is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self.values.move_to_end(key)
+        return value
+
+    def put(self, key, value):
+        self.values[key] = value
+        if len(self.values) > self.maxsize:
+            self.values.popitem(last=False)
+
+    def hit_rate(self):
+        calls = self.hits + self.misses
+        return self.hits / calls if calls else 0.0
+
+    def clear(self):
+        self.values.clear()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self.values)
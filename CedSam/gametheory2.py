@@ -11,8 +11,10 @@ Students
 * please feel free adapt for your own use-case.
 """
 
+from collections import OrderedDict
 import numpy as np
 import scipy.optimize as opt
+import scipy.sparse as sparse
 
 def solve_game(V, maximiser=True, rowplayer=True):
     """
@@ -23,6 +25,208 @@ def solve_game(V, maximiser=True, rowplayer=True):
     and the opponent is the MINIMISER choosing the COLUMN. Use the flags to
     change this behaviour.
 
+    Games with a saddle point (including every 1xN and Nx1 game) and games
+    where either player has only two strategies are solved exactly in
+    closed form; only larger games go to the linear program.
+
+    Parameters
+    ----------
+    * V: (n, m)-array or array-like; utility/payoff matrix;
+    * maximiser: bool (default True); compute strategy for the maximiser.
+        Set False to play as the minimiser.
+    * rowplayer: bool (default True); compute strategy for the row-chooser.
+        Set False to play as the column-chooser.
+
+    Returns
+    -------
+    * s: (n,)-array; probability vector; an equilibrium mixed strategy over
+        the rows (or columns) ensuring expected value v.
+    * v: float; mixed security level / guaranteed minimum (or maximum)
+        expected value of the equilibrium mixed strategy.
+
+    Exceptions
+    ----------
+    * OptimisationError: If the optimisation reports failure. The message
+        from the optimiser will accompany this exception.
+    """
+    V = np.asarray(V, dtype=float)
+    solution = _closed_form(V, maximiser, rowplayer)
+    if solution is None:
+        return solve_game_lp(V, maximiser=maximiser, rowplayer=rowplayer)
+    return solution
+
+
+def solve_games(Vs, maximiser=True, rowplayer=True):
+    """
+    Solve many games at once, with the same flags for every game.
+    Games with a closed-form solution are solved as in solve_game(); all
+    the others are stacked into one block-diagonal linear program, so the
+    optimiser's setup and validation cost is paid once per batch rather
+    than once per game. Its optimum is optimal for every block, since the
+    blocks share no variables or constraints.
+
+    Parameters
+    ----------
+    * Vs: sequence of (n_k, m_k)-arrays or array-likes; utility matrices.
+    * maximiser, rowplayer: as for solve_game().
+
+    Returns
+    -------
+    * list of (s, v) pairs, one per game, as returned by solve_game().
+
+    Exceptions
+    ----------
+    * OptimisationError: If the optimisation reports failure.
+    """
+    solutions = [None] * len(Vs)
+    pending = list()
+    for k, V in enumerate(Vs):
+        V = np.asarray(V, dtype=float)
+        solutions[k] = _closed_form(V, maximiser, rowplayer)
+        if solutions[k] is None:
+            pending.append((k, V))
+    if not pending:
+        return solutions
+
+    # one block per game, as set up in solve_game_lp()
+    blocks, shifts, sizes = list(), list(), list()
+    for k, V in pending:
+        if rowplayer:
+            V = V.T
+        if not maximiser:
+            V = -V
+        c = -V.min() + 1
+        blocks.append(-(V + c))
+        shifts.append(c)
+        sizes.append(V.shape[1])
+    A_ub = sparse.block_diag(blocks, format='csr')
+    res = opt.linprog(
+        np.ones(A_ub.shape[1]),
+        A_ub=A_ub,
+        b_ub=-np.ones(A_ub.shape[0]),
+    )
+    if res.status:
+        raise OptimisationError(res.message)
+
+    ends = np.cumsum(sizes)
+    for (k, V), c, x in zip(pending, shifts, np.split(res.x, ends[:-1])):
+        v = 1 / x.sum()
+        s = x * v
+        v = v - c
+        if not maximiser:
+            v = -v
+        solutions[k] = (s, v)
+    return solutions
+
+
+def _closed_form(V, maximiser, rowplayer):
+    """
+    Exact (s, v) for V and the player flags, if V has a saddle point or
+    either player has two strategies, else None.
+    """
+    # solve everything from the row-maximiser's point of view
+    W = V if rowplayer else V.T
+    if not maximiser:
+        W = -W
+    m, n = W.shape
+
+    solution = _saddle_point(W)
+    if solution is None and m == 2:
+        solution = _solve_2xn(W)
+    if solution is None and n == 2:
+        solution = _solve_mx2(W)
+    if solution is None:
+        return None
+
+    s, v = solution
+    if not maximiser:
+        v = -v
+    return s, v
+
+
+def _saddle_point(W):
+    """
+    Pure-strategy solution for the row maximiser of W, if W has a saddle
+    point (its maximin equals its minimax), else None.
+    """
+    row_mins = W.min(axis=1)
+    i = row_mins.argmax()
+    v = row_mins[i]
+    if v != W.max(axis=0).min():
+        return None
+    s = np.zeros(W.shape[0])
+    s[i] = 1.0
+    return s, float(v)
+
+
+def _solve_2xn(W):
+    """
+    Solution for the row maximiser of a 2xN game W without a saddle point.
+    The row player mixes rows (p, 1 - p); the best p is where the lower
+    envelope of the column lines p*W[0] + (1-p)*W[1] peaks, which is at
+    an end point or at a crossing of two lines.
+    """
+    candidates = _crossings(W[0] - W[1], W[1])
+    values = (np.outer(candidates, W[0]) + 
+                np.outer(1 - candidates, W[1])).min(axis=1)
+    i = values.argmax()
+    p = candidates[i]
+    return np.array([p, 1 - p]), float(values[i])
+
+
+def _solve_mx2(W):
+    """
+    Solution for the row maximiser of an Mx2 game W without a saddle point.
+    The column player's best mix (q, 1 - q) is where the upper envelope of
+    the row lines q*W[:, 0] + (1-q)*W[:, 1] bottoms out, strictly inside
+    (0, 1) since there is no saddle point. The row player then mixes two
+    rows active there, one of each slope sign, so that the column player
+    is indifferent between its columns.
+    """
+    slopes = W[:, 0] - W[:, 1]
+    candidates = _crossings(slopes, W[:, 1])
+    lines = np.outer(candidates, W[:, 0]) + np.outer(1 - candidates, W[:, 1])
+    values = lines.max(axis=1)
+    j = values.argmin()
+    v = values[j]
+
+    active = np.isclose(lines[j], v)
+    up = np.where(active & (slopes >= 0), slopes, -np.inf).argmax()
+    down = np.where(active & (slopes <= 0), slopes, np.inf).argmin()
+    s = np.zeros(W.shape[0])
+    if slopes[up] == slopes[down]:
+        s[up] = 1.0
+    else:
+        s[up] = -slopes[down] / (slopes[up] - slopes[down])
+        s[down] = 1 - s[up]
+    return s, float(v)
+
+
+def _crossings(slopes, intercepts):
+    """
+    End points 0 and 1, plus every point in (0, 1) where two of the lines
+    slope*x + intercept cross.
+    """
+    ds = slopes[:, None] - slopes[None, :]
+    di = intercepts[None, :] - intercepts[:, None]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        xs = di / ds
+    xs = xs[(ds != 0) & (xs > 0) & (xs < 1)]
+    return np.concatenate(([0.0, 1.0], xs))
+
+
+def solve_game_lp(V, maximiser=True, rowplayer=True):
+    """
+    Linear programming solver behind solve_game(), for games with no
+    closed-form solution. Same parameters and return values as solve_game().
+
+    Given a utility matrix V for a zero-sum game, compute a mixed-strategy
+    security strategy/Nash equilibrium solution along with the bound on the
+    expected value of the game to the player.
+    By default, assume the player is the MAXIMISER and chooses the ROW of V,
+    and the opponent is the MINIMISER choosing the COLUMN. Use the flags to
+    change this behaviour.
+
     Parameters
     ----------
     * V: (n, m)-array or array-like; utility/payoff matrix;
@@ -70,6 +274,167 @@ def solve_game(V, maximiser=True, rowplayer=True):
     return s, v
 
 
+def iterated_dominance(U, V, weak=False):
+    """
+    Iterated removal of dominated strategies in a two-player game, where
+    each player's payoffs are given with their own strategies as rows.
+    Every pass removes all the rows dominated by any other row at once,
+    alternating between the players until neither loses a strategy.
+
+    Parameters
+    ----------
+    * U: (n, m)-array; payoffs to the first player (n strategies) against
+        each of the second player's m strategies.
+    * V: (m, n)-array; payoffs to the second player, rows being its own
+        strategies.
+    * weak: bool (default False); also remove weakly dominated strategies
+        (no better anywhere and worse somewhere). By default only strictly
+        dominated strategies are removed.
+
+    Returns
+    -------
+    * rows: (n,)-array of bool; the first player's surviving strategies.
+    * cols: (m,)-array of bool; the second player's surviving strategies.
+    """
+    U = np.asarray(U)
+    V = np.asarray(V)
+    rows = np.ones(U.shape[0], dtype=bool)
+    cols = np.ones(U.shape[1], dtype=bool)
+    changed = True
+    while changed:
+        keep = ~dominated(U[np.ix_(rows, cols)], weak)
+        changed = not keep.all()
+        rows[rows] = keep
+        keep = ~dominated(V[np.ix_(cols, rows)], weak)
+        changed |= not keep.all()
+        cols[cols] = keep
+    return rows, cols
+
+
+def bounded_dominance(U_low, U_high, V_low, V_high):
+    """
+    Iterated removal of strictly dominated strategies, as in
+    iterated_dominance(), for a game whose payoffs are only known to lie
+    between lower and upper bounds. A row is removed when the lower
+    bounds of another row beat its upper bounds in every column still
+    in play, so that it is dominated whatever the payoffs turn out to be.
+    Strict dominance can be removed in any order, so running
+    iterated_dominance() on the exact payoffs of the survivors leaves
+    the same strategies as running it on the whole game.
+
+    Returns masks of the first and second player's surviving strategies.
+    """
+    rows = np.ones(U_low.shape[0], dtype=bool)
+    cols = np.ones(U_low.shape[1], dtype=bool)
+    changed = True
+    while changed:
+        keep = ~beaten(U_low[np.ix_(rows, cols)], U_high[np.ix_(rows, cols)])
+        changed = not keep.all()
+        rows[rows] = keep
+        keep = ~beaten(V_low[np.ix_(cols, rows)], V_high[np.ix_(cols, rows)])
+        changed |= not keep.all()
+        cols[cols] = keep
+    return rows, cols
+
+
+def beaten(low, high):
+    """
+    Mask of the rows whose upper bounds some other row's lower bounds 
+    beat everywhere
+    """
+    return (low[None, :, :] > high[:, None, :]).all(axis=2).any(axis=1)
+
+
+def dominated(U, weak=False):
+    """
+    Mask of the rows of U dominated by some other row, testing every pair
+    of rows at once.
+    """
+    better = U[:, None, :] > U[None, :, :]
+    if weak:
+        dominates = (U[:, None, :] >= U[None, :, :]).all(axis=2) & \
+                    better.any(axis=2)
+    else:
+        dominates = better.all(axis=2)
+    return dominates.any(axis=0)
+
+
+class SolutionCache:
+    """
+    LRU-bounded memo of solve_game() results, keyed by the matrix shape,
+    its bytes (as float64) and the player flags. Payoff matrices repeat a
+    lot, since the evaluation terms only take a few distinct values.
+
+    Cached strategies are returned as read-only arrays shared between
+    callers; copy one before modifying it.
+    """
+
+    def __init__(self, maxsize=4096):
+        self.maxsize = maxsize
+        self.solutions = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def solve(self, V, maximiser=True, rowplayer=True):
+        """
+        Same parameters and return values as solve_game()
+        """
+        V = np.ascontiguousarray(V, dtype=float)
+        key = (V.shape, V.tobytes(), maximiser, rowplayer)
+        solution = self.solutions.get(key)
+        if solution is not None:
+            self.hits += 1
+            self.solutions.move_to_end(key)
+            return solution
+
+        self.misses += 1
+        s, v = solve_game(V, maximiser=maximiser, rowplayer=rowplayer)
+        s.setflags(write=False)
+        solution = self.solutions[key] = (s, v)
+        if len(self.solutions) > self.maxsize:
+            self.solutions.popitem(last=False)
+        return solution
+
+    def solve_many(self, Vs, maximiser=True, rowplayer=True):
+        """
+        Same parameters and return values as solve_games(); the games
+        missing from the cache are solved together in one batch
+        """
+        solutions = [None] * len(Vs)
+        keys = [None] * len(Vs)
+        missing = list()
+        for k, V in enumerate(Vs):
+            V = np.ascontiguousarray(V, dtype=float)
+            keys[k] = (V.shape, V.tobytes(), maximiser, rowplayer)
+            solutions[k] = self.solutions.get(keys[k])
+            if solutions[k] is None:
+                missing.append((k, V))
+            else:
+                self.hits += 1
+                self.solutions.move_to_end(keys[k])
+        if not missing:
+            return solutions
+
+        self.misses += len(missing)
+        solved = solve_games([V for (k, V) in missing], 
+                                maximiser=maximiser, rowplayer=rowplayer)
+        for (k, V), (s, v) in zip(missing, solved):
+            s.setflags(write=False)
+            solutions[k] = self.solutions[keys[k]] = (s, v)
+        while len(self.solutions) > self.maxsize:
+            self.solutions.popitem(last=False)
+        return solutions
+
+    def hit_rate(self):
+        calls = self.hits + self.misses
+        return self.hits / calls if calls else 0.0
+
+    def clear(self):
+        self.solutions.clear()
+        self.hits = 0
+        self.misses = 0
+
+
 class OptimisationError(Exception):
     """For if the optimiser reports failure."""
 
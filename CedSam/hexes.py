@@ -0,0 +1,48 @@
+"""
+Integer indexing of the 61 hex tiles of the RoPaSci 360 board.
+Hex ids double as bit positions for the bitboard game state.
+"""
+
+# default size of board
+SIZE = range(-4, +4+1)
+
+# every hex tile on the board, in row-major (r, then q) order
+HEXES = tuple((r, q) for r in SIZE for q in SIZE if (-r - q) in SIZE)
+
+# hex coordinate -> hex id
+HEX_ID = {coord: i for i, coord in enumerate(HEXES)}
+
+# hex id -> single-bit mask
+HEX_BIT = tuple(1 << i for i in range(len(HEXES)))
+
+# offsets of the six adjacent hexes, in the order Token.get_adj_hex
+# has always listed them
+DIRECTIONS = ((0, -1), (-1, 0), (+1, 0), (0, +1), (-1, +1), (+1, -1))
+
+# hex id -> in-bounds adjacent hex coordinates
+ADJ_HEXES = tuple(tuple((r + dr, q + dq) for (dr, dq) in DIRECTIONS 
+                        if (r + dr, q + dq) in HEX_ID) 
+                    for (r, q) in HEXES)
+
+# hex id -> in-bounds adjacent hex ids
+NEIGHBOURS = tuple(tuple(HEX_ID[coord] for coord in adj) 
+                    for adj in ADJ_HEXES)
+
+# hex id -> whether the hex lies on the edge of the board
+BORDER = tuple(len(adj) != 6 for adj in NEIGHBOURS)
+
+# hex id -> mask of its adjacent hexes
+NEIGHBOUR_BITS = tuple(sum(HEX_BIT[adj] for adj in NEIGHBOURS[i]) 
+                        for i in range(len(HEXES)))
+
+
+def hex_ids(mask):
+    """
+    Hex ids of the bits set in a mask, lowest first
+    """
+    ids = list()
+    while mask:
+        low = mask & -mask
+        mask ^= low
+        ids.append(low.bit_length() - 1)
+    return ids
@@ -0,0 +1,242 @@
+"""
+Monte Carlo tree search player.
+
+Rather than solving a matrix game for each pair of tokens, MCTSPlayer
+searches the joint actions of the whole board with decoupled UCT: at
+every node each side picks its own action by UCB1 over its own
+statistics, and the pair of actions picks the child. Throws are cut
+down to those landing nearest a token they beat. Playouts play random
+actions (taking a capture when there is one) a few turns on, and are
+scored on tokens and throws left and how close tokens are to targets.
+
+The search is anytime: it runs until the CPU time (or iteration)
+budget of the move is spent, and plays from whatever it has gathered.
+"""
+
+from collections import Counter
+from math import log, sqrt, tanh
+from random import choice
+from time import process_time
+from CedSam.bitboard import ENEMY, UPPER, LOWER, THROW_ZONES
+from CedSam.distance import hex_distance
+from CedSam.hexes import HEXES, HEX_ID, HEX_BIT, hex_ids
+from CedSam.player import Player
+from CedSam.timing import timed
+
+CENTRE = HEX_ID[(0, 0)]
+
+# for each side and number of throws used, hex id -> the hex of the 
+# side's throw zone nearest it
+NEAREST_THROW = tuple(tuple(tuple(min(zone, key=lambda throw: 
+                                        hex_distance(throw, hex_id)) 
+                                    for hex_id in range(len(HEXES))) 
+                            for zone in zones) 
+                        for zones in THROW_ZONES)
+
+
+class Node():
+    """
+    A node of the search tree: the actions open to each side, and how
+    often each was tried and how well it scored for that side
+    """
+    __slots__ = ('actions', 'visits', 'scores', 'children', 'total')
+
+    def __init__(self, upper, lower):
+        self.actions = (upper, lower)
+        self.visits = ([0] * len(self.actions[0]), [0] * len(self.actions[1]))
+        self.scores = ([0.0] * len(self.actions[0]),
+                        [0.0] * len(self.actions[1]))
+        # (Upper action, Lower action) -> Node
+        self.children = dict()
+        self.total = 0
+
+    def select(self, side, exploration):
+        """
+        UCB1 choice of the side's action, trying every action once first
+        """
+        visits = self.visits[side]
+        untried = [i for i, n in enumerate(visits) if not n]
+        if untried:
+            return choice(untried)
+        scores = self.scores[side]
+        spread = exploration * sqrt(log(self.total))
+        return max(range(len(visits)),
+                    key=lambda i: scores[i] / visits[i] +
+                                    spread / sqrt(visits[i]))
+
+    def update(self, upper, lower, reward):
+        """
+        Record a playout through this node, reward being Upper's
+        """
+        self.total += 1
+        self.visits[0][upper] += 1
+        self.scores[0][upper] += reward
+        self.visits[1][lower] += 1
+        self.scores[1][lower] += 1 - reward
+
+
+class MCTSPlayer(Player):
+    def __init__(self, side):
+        super().__init__(side)
+        # UCB1 exploration constant
+        self.exploration = 0.3
+        # turns each playout runs before it is scored
+        self.horizon = 2
+        # worth of a token next to one it beats, in tokens up
+        self.pursuit = 0.5
+        # CPU seconds to search each move (move_time, from Player, set
+        # by the clock unless manage_time is off), and an optional cap 
+        # on the playouts
+        self.iterations = None
+        # how often each position (by Zobrist key) has come up this game,
+        # as a third time is a draw
+        self.seen = Counter()
+
+    @timed
+    def action(self):
+        """
+        Called at the beginning of each turn. Searches from the current
+        state until the move's budget runs out, and plays our action
+        most visited at the root.
+        """
+        start = process_time()
+        state = self.game_state()
+        self.seen[state.key] += 1
+        if self.manage_time:
+            self.move_time = self.clock.budget(state, self.own, self.turn)
+        deadline = start + self.move_time
+        root = Node(self.candidates(state, 0), self.candidates(state, 1))
+        iterations = 0
+        # a forced move needs no search
+        while iterations != self.iterations and len(root.actions[self.own]) > 1:
+            self.search(root, state)
+            iterations += 1
+            if process_time() > deadline:
+                break
+
+        visits = root.visits[self.own] if iterations else [1]
+        index, src, dst = root.actions[self.own][visits.index(max(visits))]
+        self.stats = {'iterations': iterations,
+                        'time': process_time() - start}
+        return self.to_action(index, src, dst)
+
+    def search(self, root, state):
+        """
+        One iteration: walk down the tree by decoupled UCB1, add the
+        first new node reached, play out from it and back up the result.
+        state is left unchanged on return
+        """
+        undo = len(state.undo)
+        node = root
+        path = list()
+        while True:
+            upper = node.select(0, self.exploration)
+            lower = node.select(1, self.exploration)
+            path.append((node, upper, lower))
+            state.make_move((node.actions[0][upper],
+                                node.actions[1][lower]))
+            outcome = state.result()
+            if self.seen[state.key] >= 2:
+                outcome = 0
+            if outcome is not None:
+                reward = (outcome + 1) / 2
+                break
+            child = node.children.get((upper, lower))
+            if child is None:
+                child = Node(self.candidates(state, 0), 
+                                self.candidates(state, 1))
+                node.children[(upper, lower)] = child
+                # the playout's first turn is the new node's first visit
+                first = (self.playout_action(state, 0), 
+                            self.playout_action(state, 1))
+                path.append((child, child.actions[0].index(first[0]), 
+                                child.actions[1].index(first[1])))
+                reward = self.playout(state, first)
+                break
+            node = child
+
+        for (node, upper, lower) in path:
+            node.update(upper, lower, reward)
+        while len(state.undo) > undo:
+            state.unmake_move()
+
+    def playout(self, state, first):
+        """
+        Plays random actions for both sides from a position still in 
+        play, starting with the (Upper, Lower) actions first, up to 
+        self.horizon turns on, and returns Upper's reward between 0 
+        and 1.
+        The moves are left on state for the caller to take back
+        """
+        moves = first
+        for turn in range(self.horizon):
+            if turn:
+                moves = (self.playout_action(state, 0),
+                            self.playout_action(state, 1))
+            state.make_move(moves)
+            outcome = state.result()
+            if outcome is not None:
+                return (outcome + 1) / 2
+        return self.material(state)
+
+    def playout_action(self, state, side):
+        """
+        A random action of the side, a capture if one is open to it
+        """
+        actions = self.candidates(state, side)
+        masks = state.masks
+        other = LOWER if side == 0 else UPPER
+        captures = [(index, src, dst) for (index, src, dst) in actions
+                    if masks[other + ENEMY[index % 3]] & HEX_BIT[dst]]
+        return choice(captures or actions)
+
+    def candidates(self, state, side):
+        """
+        The actions of a side worth searching: all of its slides and 
+        swings, but of its throws only, for each type, those landing 
+        nearest each token it beats (on it, if it is in the zone), or
+        nearest the centre if the opponent has none
+        """
+        masks = state.masks
+        base = 3 * side
+        other = LOWER if side == 0 else UPPER
+        actions = state.actions(side, throws=False)
+        used = state.throws[side]
+        if used < 9:
+            nearest = NEAREST_THROW[side][used]
+            for kind in range(3):
+                targets = hex_ids(masks[other + ENEMY[kind]]) or [CENTRE]
+                throws = {nearest[target] for target in targets}
+                actions.extend((base + kind, None, dst) 
+                                for dst in sorted(throws))
+        return actions
+
+    def material(self, state):
+        """
+        Upper's reward for the tokens and throws both sides have left,
+        each one up being worth most of the way to a win, with a little
+        for closing in on the tokens there are to beat
+        """
+        upper = 9 - state.throws[0] + state.tokens(0)
+        lower = 9 - state.throws[1] + state.tokens(1)
+        lead = upper - lower + \
+                self.pursuit * (self.closing(state, 0) - self.closing(state, 1))
+        return (1 + tanh(lead / 2)) / 2
+
+    def closing(self, state, side):
+        """
+        Sum over the side's tokens of 1 / distance to the nearest token 
+        it beats
+        """
+        masks = state.masks
+        base = 3 * side
+        other = LOWER if side == 0 else UPPER
+        total = 0
+        for kind in range(3):
+            targets = hex_ids(masks[other + ENEMY[kind]])
+            if targets:
+                for hex_id in hex_ids(masks[base + kind]):
+                    distance = min(hex_distance(hex_id, target) 
+                                    for target in targets)
+                    total += 1 / max(distance, 1)
+        return total
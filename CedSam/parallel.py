@@ -0,0 +1,110 @@
+"""
+Root-parallel search.
+
+The lookahead of each (our token, opponent token) pair at the root of a
+move is independent of the others, so the pairs can be searched at once
+in worker processes. The workers live for the whole game, each keeping
+a Player of its own, so their startup, imports, transposition table and
+solution cache carry over from one turn to the next.
+"""
+
+import atexit
+from concurrent.futures import ProcessPoolExecutor
+from CedSam.bitboard import BitBoard
+from CedSam.side import Upper
+
+# the player searching in this worker process
+_player = None
+
+
+def _start(side):
+    """
+    Sets up a worker process to search for the player of this side
+    """
+    global _player
+    from CedSam.player import Player
+    _player = Player(side)
+
+
+def _search(turn, masks, throws, stacks, history, settings, 
+            consider, opponent):
+    """
+    Searches one root pair in a worker process.
+    Returns (value, move) of each lookahead iteration it completed,
+    and its search statistics
+    """
+    # a worker may search several pairs in a turn
+    if turn != _player.turn:
+        _player.turn = turn
+        _player.new_search()
+    for name, value in settings.items():
+        setattr(_player, name, value)
+    _player.history = history
+    nodes, reused = _player.nodes, _player.reused
+    _player.iterative_deepening(BitBoard(masks, throws, stacks), 
+                                consider, [opponent])
+    return _player.depth_values, dict(_player.stats, 
+                                        nodes=_player.nodes - nodes, 
+                                        reused=_player.reused - reused)
+
+
+class SearchPool():
+    """
+    A pool of worker processes searching the root pairs of a player
+    """
+
+    # Player attributes a worker's search has to match
+    settings = ('vectorised', 'lazy', 'weak_dominance', 'symmetry', 
+                'pruning', 'quiescence', 'move_time', 'max_depth')
+
+    def __init__(self, player, workers):
+        side = "upper" if player.side is Upper else "lower"
+        self.executor = ProcessPoolExecutor(workers, initializer=_start,
+                                            initargs=(side,))
+        # the referee doesn't say when a game ends in a repeated 
+        # position, so make sure the workers go when we do
+        atexit.register(self.close)
+
+    def search(self, player, state, consider, opponents):
+        """
+        Searches consider against each of the opponents in the workers,
+        each to as deep as it can in the move's time.
+        Returns the best move (hex id) at the deepest iteration every
+        pair completed, or None if no move beats the floor value of -100
+        """
+        settings = {name: getattr(player, name) for name in self.settings}
+        futures = [self.executor.submit(_search, player.turn, 
+                                        state.masks, state.throws,
+                                        state.stacks,
+                                        player.history, settings,
+                                        consider, opponent)
+                    for opponent in opponents]
+        results = [future.result() for future in futures]
+
+        # values of deeper iterations sum more levels, so only
+        # compare pairs at a depth they all reached
+        depth = min(len(values) for (values, stats) in results)
+        best_val = -100
+        best = None
+        if depth:
+            for (values, stats) in results:
+                val, move = values[depth - 1]
+                if val > best_val:
+                    best_val = val
+                    best = move
+
+        player.completed_depth = depth
+        player.stats = {'nodes': sum(stats['nodes'] for (_, stats) in results),
+                        'pruned': sum(stats['pruned'] for (_, stats) in results),
+                        'extended': sum(stats['extended'] for (_, stats) in results),
+                        'reused': sum(stats['reused'] for (_, stats) in results),
+                        'depth': depth, 
+                        'time': max(stats['time'] for (_, stats) in results)}
+        return best
+
+    def close(self):
+        """
+        Shuts down the worker processes
+        """
+        atexit.unregister(self.close)
+        self.executor.shutdown()
@@ -1,9 +1,24 @@
+from collections import Counter
 from random import choice, randrange
+from time import process_time
 import numpy as np
 from CedSam.board import Board
+from CedSam.bitboard import BitBoard, ENEMY, AVOID, slot
+from CedSam.distance import hex_distance, euclidean_distance
+from CedSam.hexes import HEXES, HEX_ID, HEX_BIT, NEIGHBOURS, NEIGHBOUR_BITS, \
+                            BORDER, hex_ids
 from CedSam.side import Lower, Upper
 from CedSam.token import Rock, Paper, Scissors
-from CedSam.gametheory2 import solve_game
+from CedSam.gametheory2 import SolutionCache, iterated_dominance, \
+                                bounded_dominance
+from CedSam.evalcache import EvalCache
+from CedSam.transposition import TranspositionTable
+from CedSam.utility import utility_matrices, \
+                            MAX_UTILITY, MAX_UTILITY_APART
+from CedSam.symmetry import IDENTITY, PERMS, canonical_node
+from CedSam.parallel import SearchPool
+from CedSam.timing import TimeManager, timed, MAX_TURNS
+from CedSam.zobrist import CONSIDER_KEYS, TARGET_KEYS
 
 class Player:
     def __init__(self, side):
@@ -16,6 +31,7 @@ class Player:
         as Lower).
         """
         self.side = Upper if 'u' in side else Lower
+        self.own = 0 if self.side is Upper else 1
         self.enemy_side = Upper if 'u' not in side else Lower
         self.min_throw = 4 if self.side is Upper else -4
         self.max_throw = 4 if self.side is Upper else -4
@@ -34,8 +50,66 @@ class Player:
         self.opponent_tokens = list()
         self.kills = 0
         self.deaths = 0
+        self.enemy_throws = 0
+        # zobrist keys of the positions our recent moves led to
         self.history = list()
-
+        self.table = TranspositionTable()
+        self.solver = SolutionCache()
+        # memos of simple_eval's terms that only depend on the two 
+        # tokens, and of the payoff matrices of nodes, keyed by just 
+        # the tokens they depend on
+        self.evals = EvalCache()
+        self.payoffs = EvalCache(maxsize=1 << 14)
+        # build utility matrices with numpy rather than cell by cell
+        self.vectorised = True
+        # only strictly dominated moves are pruned unless this is set
+        self.weak_dominance = False
+        # without vectorising, build matrices a row at a time, leaving 
+        # out moves dominated before their payoffs are all known
+        self.lazy = True
+        # cache positions equal up to their mirror image as one entry;
+        # off, as it builds only 6% fewer nodes, and measured no faster
+        self.symmetry = False
+        # CPU seconds to spend searching each move, and the deepest
+        # lookahead iteration to try within them; the clock sets 
+        # move_time for each move unless manage_time is off
+        self.clock = TimeManager()
+        self.manage_time = True
+        self.move_time = 0.15
+        self.max_depth = 8
+        self.depth_limit = 3
+        self.completed_depth = 0
+        self.deadline = None
+        # skip lookahead subtrees that can't change the root decision
+        self.pruning = True
+        # extra levels lookahead may go past its depth limit while
+        # a capture or a death is still a move away
+        self.quiescence = 1
+        # search statistics (nodes, pruned, extended, reused, depth, 
+        # time) of the last move
+        self.nodes = 0
+        self.pruned = 0
+        self.extended = 0
+        self.stats = dict()
+        # (value, move) of each completed lookahead iteration of the move
+        self.depth_values = list()
+        # worker processes to search the root token pairs in, 
+        # 0 to search them all in this process
+        self.workers = 0
+        self.pool = None
+        # node matrices built in this search and in the one before, by 
+        # node key, so the subtree of the joint action that was played 
+        # is reused rather than rebuilt
+        self.matrices = dict()
+        self.last_matrices = dict()
+        self.reused = 0
+        # history heuristic: how often each (mask index, hex) reply 
+        # turned out the best of its node
+        self.cutoffs = Counter()
+        self.total_reused = 0
+        self.total_nodes = 0
+
+    @timed
     def action(self):
         """
         Called at the beginning of each turn. Based on the current state
@@ -43,6 +117,13 @@ class Player:
         """
         if len(self.history) > 5: 
             del self.history[0]
+        self.new_search()
+
+        # a decided position needs no search
+        state = self.game_state()
+        decided = self.decided_move(state)
+        if decided is not None:
+            return self.play(state, *decided)
 
         beatable = [type(opponent) for token in self.self_tokens 
                     for opponent in self.opponent_tokens 
@@ -52,14 +133,6 @@ class Player:
         if self.self_tokens: 
             if beatable and self.turn % 15:
                 token_best_move = dict()
-
-                # save current opponent coords
-                if self.opponent_tokens:
-                    cache_oppo = [(each.r, each.q) 
-                                    for each in self.opponent_tokens]
-                if self.self_tokens:
-                    cache_self = [(each.r, each.q) 
-                                    for each in self.self_tokens]
                 
                 if len(self.self_tokens) > 1:
                     for token in self.self_tokens:
@@ -71,7 +144,8 @@ class Player:
                         if both:
                             while both:
                                 opponent = both.pop(0)
-                                val = self.target_eval(token, opponent)
+                                val = self.target_eval(token.hex, 
+                                                        opponent.hex)
                                 if val > best_val:
                                     best_val = val
                         else:
@@ -82,51 +156,32 @@ class Player:
                 else:
                     move = self.self_tokens[0]
                     
-                ori_r, ori_q = move.r, move.q
-                (best_r, best_q) = False, False
-                best_val = -100
+                # search on a bitboard copy of the current game state
+                state = self.game_state()
+                cur = move.hex
                 both = [target for target in self.opponent_tokens 
                         if isinstance(target, move.enemy)] + \
                         [enemy for enemy in self.opponent_tokens 
                         if isinstance(enemy, move.avoid)]
-                while both:
-                    opponent = both.pop(0)
-                    self_tokens = self.self_tokens.copy()
-                    self_oppo = self.opponent_tokens.copy()
-                    val, new_move = self.lookahead(move, opponent, self_tokens, 
-                                                    self_oppo, depth = 0)
-                    if val > best_val:
-                        best_val = val
-                        (best_r, best_q) = new_move
-                    move.r, move.q = ori_r, ori_q
-                if best_val == -100:
-                    (best_r, best_r) = choice([(r, q) for (r, q) in 
-                                            move.get_adj_hex(move.r, move.q) 
-                                            if Board.check_bounds(r, q)])
-
-                if self.opponent_tokens:
-                    for i in range(len(cache_oppo)):
-                        c_r, c_q = cache_oppo[i]
-                        self.opponent_tokens[i].move(c_r, c_q)
-                if self.self_tokens:
-                    for i in range(len(cache_self)):
-                        c_r, c_q = cache_self[i]
-                        self.self_tokens[i].move(c_r, c_q)
-
-                self.history.append((move, best_r, best_q))
-                if move.hex_distance([move.r, move.q], [best_r, best_q]) > 1:
-                    return ("SWING", (move.r, move.q), (best_r, best_q))
+                if self.manage_time:
+                    self.move_time = self.clock.budget(state, self.own, 
+                                                        self.turn)
+                if self.workers:
+                    if self.pool is None:
+                        self.pool = SearchPool(self, self.workers)
+                    best = self.pool.search(self, state, move, both)
                 else:
-                    return ("SLIDE", (move.r, move.q), (best_r, best_q))
+                    best = self.iterative_deepening(state, move, both)
+                if best is None:
+                    best = HEX_ID[choice(move.get_adj_hex(move.r, move.q))]
+                return self.play(state, slot(move.side, move.kind), cur, best)
 
             elif not beatable:
                 if len(self.self_tokens) > 1:
                     token = choice(self.self_tokens)
                 else :
                     token = self.self_tokens[0]
-                (best_r, best_q) = choice([(r, q) for (r, q) in 
-                                            token.get_adj_hex(token.r, token.q) 
-                                            if Board.check_bounds(r, q)])
+                (best_r, best_q) = choice(token.get_adj_hex(token.r, token.q))
                 if token.hex_distance([token.r, token.q], [best_r, best_q]) > 1:
                     return ("SWING", (token.r, token.q), (best_r, best_q))
                 else:
@@ -169,6 +224,67 @@ class Player:
             return ("THROW", token.name.lower(), (r, q))
     
     
+    def play(self, state, index, src, dst):
+        """
+        Records our (index, src, dst) move (see BitBoard.make_move) in 
+        the move history, and returns it in the referee's action format
+        state: bitboard of the current game state, the move is made on it
+        """
+        state.make_move(((index, src, dst),), battle=False)
+        self.history.append(state.key)
+        return self.to_action(index, src, dst)
+
+    def to_action(self, index, src, dst):
+        """
+        Turns an (index, src, dst) move into the referee's action format
+        """
+        if src is None:
+            # game_state() counts our throws by the tokens left in
+            # self.throws, so use one up, of this type if there is one
+            kind = index % 3
+            chosen = next((token for token in self.throws
+                            if token.kind == kind), self.throws[0])
+            self.throws.remove(chosen)
+            return ("THROW", "rps"[kind], HEXES[dst])
+        if dst in NEIGHBOURS[src]:
+            return ("SLIDE", HEXES[src], HEXES[dst])
+        return ("SWING", HEXES[src], HEXES[dst])
+
+    def decided_move(self, state):
+        """
+        Recognises a position decided under the referee's end of game 
+        rules, where one of our tokens is invincible (see 
+        BitBoard.invincible): nothing can stop it hunting down the 
+        opponent's tokens it beats, so there is nothing to search.
+        Returns the (mask index, src, dst) move of an invincible token 
+        that lands on or closest to one of its targets, preferring 
+        positions we have not recently moved into, or None if the 
+        position is still contested
+        """
+        kinds = state.invincible(self.own)
+        if not kinds:
+            return None
+        masks = state.masks
+        base = 3 * self.own
+        other = 3 - base
+        ours = masks[base] | masks[base + 1] | masks[base + 2]
+        moves = list()
+        for (index, src, dst) in state.actions(self.own, throws=False):
+            kind = index - base
+            # never land on (and battle) a token of ours of another type
+            if kind not in kinds or (ours & ~masks[index]) & HEX_BIT[dst]:
+                continue
+            targets = hex_ids(masks[other + ENEMY[kind]])
+            state.make_move(((index, src, dst),), battle=False)
+            repeated = state.key in self.history
+            state.unmake_move()
+            closest = min(hex_distance(dst, target) for target in targets)
+            moves.append((repeated, closest, index, src, dst))
+        if not moves:
+            return None
+        return min(moves)[2:]
+
+    @timed
     def update(self, opponent_action, player_action):
         """
         Called at the end of each turn to inform this player of both
@@ -206,6 +322,7 @@ class Player:
         if "THROW" == opponent_action[0]:
             token_name2 = opponent_action[1]
             (r2, q2) = opponent_action[2]
+            self.enemy_throws += 1
             if 'r' in token_name2:
                 self.opponent_tokens.append(Rock(self.enemy_side, r2, q2))
             elif 'p' in token_name2:
@@ -230,158 +347,260 @@ class Player:
         self.self_tokens, self.opponent_tokens = new_self, new_oppo
         self.turn += 1
 
-    def adjust_list(self, token, token_list, new_r, new_q):
+        # the search workers aren't needed once the game is over
+        if self.pool is not None and (self.turn >= MAX_TURNS or 
+                                        self.game_state().result() is not None):
+            self.pool.close()
+            self.pool = None
+
+    def new_search(self):
         """
-        Adjusts a list of tokens to provide updated list
+        Starts the search of a new turn: ages the transposition table,
+        and keeps only the last turn's node matrices for reuse
         """
-        token_list[token_list.index(token)].move(new_r, new_q)
-        return token_list
-
-    def build_utility(self, consider, enemy_token, 
-                        self_tokens, opponent_tokens):
+        self.table.new_search()
+        self.total_reused += self.reused
+        self.total_nodes += self.nodes
+        self.last_matrices, self.matrices = self.matrices, dict()
+        # let the history heuristic favour recent turns
+        for reply in list(self.cutoffs):
+            self.cutoffs[reply] //= 2
+            if not self.cutoffs[reply]:
+                del self.cutoffs[reply]
+        self.reused = 0
+        self.nodes = 0
+
+    def game_state(self):
         """
-        Builds a 2-d utility matrix in a list of lists.
-        Also returns a list of the valid moves we and the opponent can make.
-        consider: our token, which we're calculating utility for
-        enemy_token: opponent's token, can be either target to kill, 
-        or enemy to avoid
-
-        e.g. [[1,2,4,5], [2,4,8,6]]
+        Builds a bitboard of the current game state from our token lists
         """
+        throws = [9 - len(self.throws), self.enemy_throws]
+        if self.side is Lower:
+            throws.reverse()
+        return BitBoard.from_tokens(self.self_tokens + self.opponent_tokens, 
+                                    throws)
 
-        util_matrix = list()
-        
-        possible = [(r, q) for (r, q) in 
-                    consider.get_adj_hex(consider.r, consider.q) 
-                    if Board.check_bounds(r, q)]
-        enemy_moves = [(r, q) for (r, q) in 
-                        enemy_token.get_adj_hex(enemy_token.r, enemy_token.q) 
-                        if Board.check_bounds(r, q)]
-
-        # cache original token coords
-        (ori_r, ori_q) = (consider.r, consider.q)
-
-        for (move_r, move_q) in possible:
-            shallow_self = self_tokens.copy()
-            shallow_self = \
-                self.adjust_list(consider, shallow_self, move_r, move_q)
-
-            shallow_opp = opponent_tokens.copy()
-            row_utility = self.build_by_row(consider, enemy_token, enemy_moves, 
-                                            shallow_self, shallow_opp)
-
-            # put it back to its original spot
-            shallow_self = \
-                self.adjust_list(consider, shallow_self, ori_r, ori_q)
-
-            if len(row_utility) != 0:
-                util_matrix.append(row_utility)
-                          
-        return util_matrix, possible, enemy_moves
-    
-    def build_by_row(self, consider, enemy_token, 
-                    enemy_moves, shallow_self, shallow_opp):
-
-        row_utility = list()
-        (ori_r, ori_q) = (enemy_token.r, enemy_token.q)
-
-        for (opp_r, opp_q) in enemy_moves:
-            shallow_opp = \
-                self.adjust_list(enemy_token, shallow_opp, opp_r, opp_q)
-        
-            # now we have the modified lists of tokens, 
-            # i.e. a gamestate where two moves have been taken
-            alive_self, alive_opp = self.board.battle(shallow_self, shallow_opp)
-
-            row_utility.append(self.simple_eval(consider, 
-                                alive_self, alive_opp, enemy_token))
+    def build_utilities(self, state, consider, cur, target, opp):
+        """
+        Builds the utility matrices of both tokens of a node in one pass 
+        over their joint moves, each joint move being resolved once for 
+        both: consider's (on hex id cur), and target's (on hex id opp), 
+        each with its own moves as rows.
+        Also returns the moves of consider and target.
+        state: bitboard game state, left unchanged on return
+        """
+        my_moves = list(NEIGHBOURS[cur])
+        opp_moves = list(NEIGHBOURS[opp])
+        own = slot(consider.side, consider.kind)
+        index = slot(target.side, target.kind)
+
+        # the payoffs only depend on the two tokens and on what stands 
+        # on the hexes they can move to
+        region = NEIGHBOUR_BITS[cur] | NEIGHBOUR_BITS[opp]
+        key = (own, cur, index, opp, self.vectorised, self.lazy, 
+                self.weak_dominance, 
+                tuple(mask & region for mask in state.masks),
+                (own, cur) in state.stacks, (index, opp) in state.stacks)
+        payoffs = self.payoffs.get(key)
+        if payoffs is None:
+            payoffs = self.build_payoffs(state, consider, cur, target, opp, 
+                                            my_moves, opp_moves)
+            self.payoffs.put(key, payoffs)
+        util_matrix, opp_util, my_moves, opp_moves = payoffs
+        return util_matrix, opp_util, list(my_moves), list(opp_moves)
+
+    def build_payoffs(self, state, consider, cur, target, opp, 
+                        my_moves, opp_moves):
+        """
+        The two utility matrices of build_utilities() and the moves 
+        they cover, built rather than taken from the memo
+        """
+        if self.vectorised:
+            return (*utility_matrices(state, consider, cur, target, opp, 
+                                        my_moves, opp_moves), 
+                    my_moves, opp_moves)
+        if self.lazy:
+            return self.lazy_payoffs(state, consider, cur, target, opp, 
+                                        my_moves, opp_moves)
+
+        own = slot(consider.side, consider.kind)
+        index = slot(target.side, target.kind)
+        util_matrix = [[0] * len(opp_moves) for move in my_moves]
+        opp_util = [[0] * len(my_moves) for move in opp_moves]
+        for i, move in enumerate(my_moves):
+            for j, opp_move in enumerate(opp_moves):
+                state.make_move(((own, cur, move), (index, opp, opp_move)))
+                util_matrix[i][j] = self.simple_eval(state, consider, move, 
+                                                    target, opp_move)
+                opp_util[j][i] = self.simple_eval(state, target, opp_move, 
+                                                    consider, move)
+                state.unmake_move()
+        return util_matrix, opp_util, my_moves, opp_moves
+
+    def lazy_payoffs(self, state, consider, cur, target, opp, 
+                        my_moves, opp_moves):
+        """
+        The two utility matrices of build_payoffs(), built without a 
+        battle for every joint move. Only ally_eval needs the battle, 
+        and it only depends on the other token's move when both tokens 
+        land on one hex, so each move is battled once with the other 
+        token off the board. That leaves the shared hexes, where all 
+        that is known is that ally_eval takes 0 or 50: moves dominated
+        whichever it takes are left out (unless weak dominance is on),
+        and the shared hexes of the rest are battled.
+        Returns the matrices and the moves they still cover
+        """
+        own = slot(consider.side, consider.kind)
+        index = slot(target.side, target.kind)
+        my_ally = self.lone_allies(state, consider, cur, my_moves, index, opp)
+        opp_ally = self.lone_allies(state, target, opp, opp_moves, own, cur)
+
+        # simple_eval's terms other than ally_eval, and its exact value 
+        # where the tokens land apart, with the terms in the same order
+        mine = np.array([[self.eval_base(consider, move, target, opp_move) 
+                            for opp_move in opp_moves] for move in my_moves])
+        theirs = np.array([[self.eval_base(target, opp_move, consider, move) 
+                            for move in my_moves] for opp_move in opp_moves])
+        my_border = np.array([self.border_eval(move) for move in my_moves])
+        opp_border = np.array([self.border_eval(move) for move in opp_moves])
+        same = np.array(my_moves)[:, None] == np.array(opp_moves)[None, :]
+        mine_high = mine - np.where(same, 0, my_ally[:, None]) - \
+                    my_border[:, None]
+        theirs_high = theirs - np.where(same.T, 0, opp_ally[:, None]) - \
+                        opp_border[:, None]
+
+        rows = np.ones(len(my_moves), dtype=bool)
+        cols = np.ones(len(opp_moves), dtype=bool)
+        if not self.weak_dominance:
+            mine_low = np.where(same, mine - 50 - my_border[:, None], 
+                                mine_high)
+            theirs_low = np.where(same.T, theirs - 50 - opp_border[:, None], 
+                                    theirs_high)
+            rows, cols = bounded_dominance(mine_low, mine_high, 
+                                            theirs_low, theirs_high)
+
+        # battle the shared hexes still in play
+        for i, j in zip(*np.nonzero(same & rows[:, None] & cols[None, :])):
+            state.make_move(((own, cur, my_moves[i]), 
+                                (index, opp, opp_moves[j])))
+            mine_high[i, j] = mine[i, j] - \
+                self.ally_eval(state, consider, my_moves[i]) - my_border[i]
+            theirs_high[j, i] = theirs[j, i] - \
+                self.ally_eval(state, target, opp_moves[j]) - opp_border[j]
+            state.unmake_move()
+
+        my_moves = [move for move, keep in zip(my_moves, rows) if keep]
+        opp_moves = [move for move, keep in zip(opp_moves, cols) if keep]
+        return mine_high[np.ix_(rows, cols)], theirs_high[np.ix_(cols, rows)], \
+                my_moves, opp_moves
+
+    def lone_allies(self, state, consider, cur, moves, other, other_hex):
+        """
+        ally_eval of consider (on hex id cur) after each of its moves, 
+        battled with the other token (mask index other, on other_hex)
+        lifted off the board
+        """
+        state.remove(other, other_hex)
+        allies = list()
+        for move in moves:
+            state.make_move(((slot(consider.side, consider.kind), cur, move),))
+            allies.append(self.ally_eval(state, consider, move))
+            state.unmake_move()
+        state.place(other, other_hex)
+        return np.array(allies)
+
+    def simple_eval(self, state, cur_token, cur, enemy_token, opp):
+        """
+        return evaluation of player tokens moves,
+        with cur_token on hex id cur and enemy_token on hex id opp
+        """
+        difference = self.eval_base(cur_token, cur, enemy_token, opp)
+        difference -= self.ally_eval(state, cur_token, cur)
+        difference -= self.border_eval(cur)
+        return difference
 
-            shallow_opp = \
-                self.adjust_list(enemy_token, shallow_opp, ori_r, ori_q)
-        
-        return row_utility
+    def eval_base(self, cur_token, cur, enemy_token, opp):
+        """
+        The terms of simple_eval that only depend on the two tokens,
+        taken from the memo if they were worked out before
+        """
+        key = (cur_token.kind, cur, enemy_token.kind, opp)
+        difference = self.evals.get(key)
+        if difference is None:
+            difference = self.base_terms(cur_token, cur, enemy_token, opp)
+            self.evals.put(key, difference)
+        return difference
 
-    def simple_eval(self, cur_token, self_tokens, opponent_tokens, enemy_token):
+    def base_terms(self, cur_token, cur, enemy_token, opp):
         """
-        return evaluation of player tokens moves
+        eval_base worked out term by term, rather than from the memo
         """
         difference = 10
-        if isinstance(enemy_token, cur_token.enemy):
-            difference += self.target_eval(cur_token, enemy_token)
-            difference += self.kill_eval(cur_token, enemy_token)
+        if enemy_token.kind == ENEMY[cur_token.kind]:
+            difference += self.target_eval(cur, opp)
+            difference += self.kill_eval(cur, opp)
         else:
-            difference -= self.avoid_eval(cur_token, enemy_token)
-            difference -= self.death_eval(cur_token, enemy_token)
-        difference -= self.ally_eval(cur_token, self_tokens)
-        difference -= self.border_eval(cur_token)
+            difference -= self.avoid_eval(cur, opp)
+            difference -= self.death_eval(cur, opp)
         return difference
 
-    def target_eval(self, cur_token, enemy_token):
+    def target_eval(self, cur, opp):
         """
         return evaluation score based on distance to a target token to attack
         """
         w = 1
-        distance = cur_token.hex_distance([cur_token.r, cur_token.q], 
-                                            [enemy_token.r, enemy_token.q])
+        distance = hex_distance(cur, opp)
         if distance:
             return w * (((10/distance) * (distance + 1)) / 10)
         return w
 
-    def kill_eval(self, cur_token, enemy_token):
+    def kill_eval(self, cur, opp):
         """
         return evaluation score based on ability to kill a token
         """
         w = 40
-        distance = cur_token.euclidean_distance([cur_token.r, cur_token.q], 
-                                                [enemy_token.r, enemy_token.q])
+        distance = euclidean_distance(cur, opp)
         if distance == 0:
             return w
         return 0
 
-    def avoid_eval(self, cur_token, enemy_token):
+    def avoid_eval(self, cur, opp):
         """
         return evaluation score based on 
         distance to an enemy token to escape from
         """
         w = 10
-        distance = cur_token.hex_distance([cur_token.r, cur_token.q], 
-                                        [enemy_token.r, enemy_token.q])
+        distance = hex_distance(cur, opp)
         if distance:
             return w * (((10/distance) * (distance + 1)) / 10)
         return w
     
-    def death_eval(self, cur_token, enemy_token):
+    def death_eval(self, cur, opp):
         """
         return evaluation score based on ability for a token to die from enemy
         """
         w = 50
-        distance = cur_token.euclidean_distance([cur_token.r, cur_token.q], 
-                                                [enemy_token.r, enemy_token.q])
+        distance = euclidean_distance(cur, opp)
         if distance == 0:
             return w
         return 0
 
-    def ally_eval(self, cur_token, self_tokens):
+    def ally_eval(self, state, cur_token, cur):
         """
         return evaluation score based on ability to kill an ally token
         """
         w = 50
-        team_kill = [(token.r, token.q) for token in self_tokens 
-                    if isinstance(token, cur_token.enemy) or 
-                    isinstance(token, cur_token.avoid) or 
-                    isinstance(cur_token, token.avoid) or 
-                    isinstance(cur_token, token.enemy)]
-        return w if (cur_token.r, cur_token.q) in team_kill else 0
+        base = slot(cur_token.side, 0)
+        team_kill = state.masks[base + ENEMY[cur_token.kind]] | \
+                    state.masks[base + AVOID[cur_token.kind]]
+        return w if team_kill & HEX_BIT[cur] else 0
 
-    def border_eval(self, cur_token):
+    def border_eval(self, cur):
         """
         return evaluation score based on if the token is on a border tile
         """
         w = 50
-        border = len([(r, q) for (r, q) in 
-                    cur_token.get_adj_hex(cur_token.r, cur_token.q) 
-                    if self.board.check_bounds(r, q)]) != 6
-        return w if border else 0
+        return w if BORDER[cur] else 0
     
     def swing_eval(self, cur_token, self_tokens):
         """
@@ -392,112 +611,285 @@ class Player:
         allies = set([(token.r, token.q) for token in self_tokens])
         return w if adj.intersection(allies) else 0
     
-    def lookahead(self, consider, target, self_tokens, opponent_tokens, depth):
+    def node_key(self, state, consider, cur, target, opp):
+        """
+        Zobrist key of a lookahead node: the position, 
+        plus which of our tokens plays against which of theirs.
+        Returns the board transform taking the node to the form 
+        it is cached under, and the key of that form
+        """
+        own = slot(consider.side, consider.kind)
+        index = slot(target.side, target.kind)
+        if self.symmetry:
+            return canonical_node(state, own, cur, index, opp)
+        return IDENTITY, state.key ^ CONSIDER_KEYS[own][cur] ^ \
+                                    TARGET_KEYS[index][opp]
+
+    def node_matrix(self, state, consider, cur, target, opp):
+        """
+        Builds the utility matrix of a lookahead node,
+        with dominated strategies removed, or takes it from this search
+        or the last one if they already built it.
+        Returns the matrix and the remaining moves of both tokens
+        """
+        key = state.key ^ CONSIDER_KEYS[slot(consider.side, consider.kind)][cur] ^ \
+                        TARGET_KEYS[slot(target.side, target.kind)][opp]
+        node = self.matrices.get(key)
+        if node is None:
+            node = self.last_matrices.pop(key, None)
+            if node is not None:
+                self.reused += 1
+            else:
+                self.nodes += 1
+                util_matrix, opp_util, my_moves, opp_moves = \
+                    self.build_utilities(state, consider, cur, target, opp)
+                # change is here! carry out iterative removal
+                util_matrix = np.array(util_matrix)
+                mine, theirs = self.remove_dom(util_matrix, np.array(opp_util))
+                util_matrix = util_matrix[np.ix_(mine, theirs)]
+                my_moves = [move for move, keep in zip(my_moves, mine) if keep]
+                opp_moves = [move for move, keep in zip(opp_moves, theirs) if keep]
+                node = (util_matrix, tuple(my_moves), tuple(opp_moves))
+            self.matrices[key] = node
+        # lookahead edits the move lists, so hand out copies
+        util_matrix, my_moves, opp_moves = node
+        return util_matrix, list(my_moves), list(opp_moves)
+
+    def iterative_deepening(self, state, consider, opponents):
+        """
+        Searches the moves of our token consider against each of the 
+        opponents with lookahead to depth limits 1, 2, 3, ... until the 
+        per-move time budget (self.move_time, in CPU seconds) runs out 
+        or self.max_depth is reached.
+        Returns the best move (hex id) of the last completed iteration,
+        or None if no move beats the floor value of -100
+        """
+        start = process_time()
+        deadline = start + self.move_time
+        undo = len(state.undo)
+        best = None
+        self.pruned = 0
+        self.extended = 0
+        self.depth_values = list()
+
+        for limit in range(1, self.max_depth + 1):
+            began = process_time()
+            self.depth_limit = limit
+            # always finish the first iteration, so there is a move to play
+            self.deadline = deadline if limit > 1 else None
+            try:
+                best_val, best_move = self.search_root(state, consider, 
+                                                        opponents, -100)
+            except SearchTimeout:
+                # take back the moves of the abandoned iteration
+                while len(state.undo) > undo:
+                    state.unmake_move()
+                break
+            best = best_move
+            self.completed_depth = limit
+            self.depth_values.append((best_val, best_move))
+
+            # don't start an iteration there is no time to finish,
+            # each one costing several times the one before
+            now = process_time()
+            if now + 4 * (now - began) > deadline:
+                break
+
+        self.deadline = None
+        self.stats = {'nodes': self.nodes, 'pruned': self.pruned, 
+                        'extended': self.extended, 'reused': self.reused, 
+                        'depth': self.completed_depth, 
+                        'time': process_time() - start}
+        return best
+
+    def search_root(self, state, consider, opponents, alpha):
+        """
+        One iteration of lookahead for consider against each opponent.
+        Returns the best value and move (hex id) found above alpha,
+        or (alpha, None) if there are none
+        """
+        best_val = alpha
+        best_move = None
+        for opponent in opponents:
+            val, new_move = self.lookahead(state, consider, consider.hex, 
+                                            opponent, opponent.hex, 
+                                            depth = 0, alpha = best_val)
+            if val > best_val:
+                best_val = val
+                best_move = new_move
+        return best_val, best_move
+
+    def child_order(self, move, best, index):
+        """
+        Sort key of children (opp replies, by hex id) in lookahead with
+        the same ceiling: replies landing on our token first, then
+        replies closing in on it, and replies that most often turned 
+        out best before
+        """
+        return (move != best, hex_distance(best, move), 
+                -self.cutoffs[(index, move)])
+
+    def subtree_bound(self, consider, target, distance, levels):
+        """
+        Upper bound on what the `levels` levels of lookahead below a node 
+        can add to its value, when its tokens are distance apart
+        """
+        # running from a token scores below zero at every level,
+        # so the levels below never add anything
+        if target.kind != ENEMY[consider.kind]:
+            return 0
+        # the tokens close in by at most 2 hexes per level, and 
+        # only landing on the target scores above MAX_UTILITY_APART
+        return sum(MAX_UTILITY if distance <= 2 * (level + 1) 
+                    else MAX_UTILITY_APART for level in range(1, levels + 1))
+
+    def lookahead(self, state, consider, cur, target, opp, depth, 
+                    node=None, alpha=-np.inf):
         """
         Carries out the search in a tree of utility matrices 
         to find the best action for our token.
         Returns the SUM utility of best moves seen
-        consider: a token of ours that we're thinking to move
-        depth: terminal limit, i.e. number of moves we're looking ahead
-
-        # wip: pruning, and maybe recognizing repeated states
-        """
-        # cache original token & enemy token coords
-        ori_r, ori_q = consider.r, consider.q
-        opp_r, opp_q = target.r, target.q
-
-        # we stop recursing if we hit a limit, and returns the value of playing to this gamestate
-        if depth == 3:
-            util_matrix, my_moves, opp_moves = self.build_utility(consider, target, self_tokens, opponent_tokens)
-            opp_util, _a, _b = self.build_utility(target, consider, opponent_tokens, self_tokens)
-            util_matrix = self.remove_dom(np.array(util_matrix), np.array(opp_util), my_moves, opp_moves)
-            sol, val = solve_game(np.array(util_matrix), maximiser=True, rowplayer=True)
-            return val, my_moves
-
-        util_matrix, my_moves, opp_moves = self.build_utility(consider, target, self_tokens, opponent_tokens)
-        # change is here! carry out iterative removal
-        opp_util, _a, _b = self.build_utility(target, consider, opponent_tokens, self_tokens)
-        util_matrix = self.remove_dom(np.array(util_matrix), np.array(opp_util), my_moves, opp_moves)
-        
-        sol_best, val_best = solve_game(util_matrix, maximiser=True, rowplayer=True)
-        consider.move(ori_r, ori_q)
+        state: bitboard game state, left unchanged on return
+        consider: a token of ours that we're thinking to move, on hex id cur
+        target: the opponent token it plays against, on hex id opp
+        depth: number of moves looked ahead so far; the search stops
+        at self.depth_limit, or up to self.quiescence moves past it
+        while the tokens can still meet
+        node: (our moves, opp moves, strategy, value) of this node,
+        if its parent already solved it
+        alpha: the value this node has to beat to change the decision 
+        at the root; values at or below it may be returned inexact
+
+        Pruning follows simultaneous-move alpha-beta (Saffidine et al.,
+        Bosansky et al.), adapted to our tree: a node's value is its
+        matrix game value plus the best of the opp's replies, so bounds
+        come from the solved child games rather than from per-cell LPs.
+
+        """
+        if self.deadline is not None and process_time() > self.deadline:
+            raise SearchTimeout()
+        remaining = self.depth_limit - depth
+
+        transform, key = self.node_key(state, consider, cur, target, opp)
+        perm = PERMS[transform]
+
+        if node is None:
+            # reuse the value of a node already solved through another path
+            entry = self.table.probe(key, remaining)
+            if entry is not None:
+                return entry.value, perm[entry.move]
+
+            util_matrix, my_moves, opp_moves = \
+                self.node_matrix(state, consider, cur, target, opp)
+            sol_best, val_best = self.solver.solve(util_matrix, maximiser=True, rowplayer=True)
+        else:
+            my_moves, opp_moves, sol_best, val_best = node
+
+        # we stop recursing if we hit a limit, and returns the value of playing to this gamestate,
+        # unless the tokens could still meet next turn: then the search 
+        # is extended by up to self.quiescence levels, following only 
+        # the replies that keep them within reach
+        horizon = depth >= self.depth_limit
+        if horizon:
+            best = my_moves[int(np.argmax(sol_best))]
+            if remaining + self.quiescence <= 0 or \
+                all(hex_distance(best, move) > 2 for move in opp_moves):
+                self.table.store(key, remaining, val_best, perm[best])
+                return val_best, best
 
         # fix what our best move is
         sol_best = sol_best.tolist()
-        (best_r, best_q) = my_moves[sol_best.index(max(sol_best))]
-        if (consider, best_r, best_q) in self.history and len(my_moves) > 1 and len(self.history) >= 5:
-            my_moves.remove((best_r, best_q))
+        best = my_moves[sol_best.index(max(sol_best))]
+
+        # play our best move, unless it leads back to 
+        # a position we recently moved into
+        own = slot(consider.side, consider.kind)
+        state.make_move(((own, cur, best),), battle=False)
+        if state.key in self.history and len(my_moves) > 1 and len(self.history) >= 5:
+            state.unmake_move()
+            my_moves.remove(best)
             sol_best.remove(max(sol_best))
-            (best_r, best_q) = my_moves[sol_best.index(max(sol_best))]
-        new_self = self.adjust_list(consider, self_tokens, best_r, best_q)
+            best = my_moves[sol_best.index(max(sol_best))]
+            state.make_move(((own, cur, best),), battle=False)
 
         max_value = 0
+        index = slot(target.side, target.kind)
+        if horizon:
+            self.extended += 1
+            opp_moves = [move for move in opp_moves 
+                            if hex_distance(best, move) <= 2]
+
+        # build the matrices of the opp moves not seen before,
+        # so that they can all be solved in one batch
+        children = list()
+        for move in opp_moves:
+            state.make_move(((index, opp, move),), battle=False)
+            _, child_key = self.node_key(state, consider, best, target, move)
+            entry = self.table.probe(child_key, remaining - 1)
+            if entry is not None:
+                max_value = max(max_value, entry.value)
+            else:
+                children.append((move, *self.node_matrix(state, consider, 
+                                                    best, target, move)))
+            state.unmake_move()
+        solutions = self.solver.solve_many(
+                        [util_matrix for (move, util_matrix, _a, _b) in children], 
+                        maximiser=True, rowplayer=True)
+
+        # a child's value is its own game value plus at most 
+        # subtree_bound() for the levels below it: its ceiling. Explore 
+        # the children by falling ceiling (ties in child_order()), so 
+        # once one can neither beat the best child so far nor lift this
+        # node above alpha, none of the rest can either
+        # (leaf children are already solved, and are only stored)
+        levels = remaining - 1 + self.quiescence
+        order = sorted(((child, solution, solution[1] + 
+                        self.subtree_bound(consider, target, 
+                                hex_distance(best, child[0]), levels))
+                        for child, solution in zip(children, solutions)), 
+                        key=lambda item: (-item[2], 
+                                    self.child_order(item[0][0], best, index)))
 
         # explore the possible moves opp can take
-        for move in opp_moves:
-            opp_r, opp_q = move
-            # adjust opp's list, and recurse
-            new_opp = self.adjust_list(target, opponent_tokens, opp_r, opp_q)
-            val, best_move = self.lookahead(consider, 
-                                    target, new_self, new_opp, depth + 1)
-            target.move(opp_r, opp_q)
+        for i, ((move, _, my_next, opp_next), (sol, val), ceiling) in enumerate(order):
+            floor = max(max_value, alpha - val_best)
+            if self.pruning and levels > 0 and ceiling <= floor:
+                # the children after it have no higher ceiling
+                self.pruned += len(order) - i
+                break
+
+            # move opp's token, and recurse
+            state.make_move(((index, opp, move),), battle=False)
+            val, best_move = self.lookahead(state, consider, best, 
+                                            target, move, depth + 1, 
+                                            (my_next, opp_next, sol, val), 
+                                            alpha = floor)
+            state.unmake_move()
 
             if val > max_value:
                 max_value = val
+                self.cutoffs[(index, move)] += 1
         
-        return val_best + max_value, (best_r, best_q)
+        state.unmake_move()
 
-    """
-    Carry out iterated removal of dominated strategies
-    """
-    def remove_dom(self, my_util, opp_util, my_valid_moves, opp_valid_moves):
-    
-        # check if there's any dominated strategies in the matrices
-        has_change1 = True
-        has_change2 = True
-
-        while has_change1 or has_change2:
-            my_util, my_valid_moves, opp_util, has_change1 = \
-                self.check_for_dom(my_util, my_valid_moves, opp_util)
-            opp_util, opp_valid_moves, my_util, has_change2 = \
-                self.check_for_dom(opp_util, opp_valid_moves, my_util)
-        return my_util
-
-    """
-    Carries out dominated strategy removal, 
-    to result in a smaller payoff matrix
-    my_util: Utility matrix for token in consideration
-    my_valid_moves: List of corresponding moves
-    """
-    def check_for_dom(self, my_util, my_valid_moves, opp_util):
-        
-        # print("my util's shape: " + str(my_util.shape) + "len of moves: " + str(len(my_valid_moves)))
-        # print("opp util's shape: " + str(opp_util.shape))
+        # a value at or below alpha may rest on children cut off or only
+        # searched as far as showing they don't beat alpha, so it is 
+        # only known not to beat alpha. Above alpha, every child that 
+        # could have been the best was searched in full
+        if val_best + max_value > alpha:
+            self.table.store(key, remaining, val_best + max_value, perm[best])
+        return val_best + max_value, best
 
-        # sort in descending order by sum, in order to get what most likely will be dominator
-        sorted_util = sorted(my_util, key=sum, reverse=True)
-        has_change = False
-
-        # check to see if any ROW dominates another
-        dominator = sorted_util[0]
-        to_remove = list()
-        for i in range(len(my_util)):
-            
-            row = my_util[i]
-            if self.dominates(dominator, row):
-                to_remove.append(i)
-                has_change = True
-
-        # remove the dominated strategies
-        my_util = np.delete(my_util, to_remove, axis = 0)
-        opp_util = np.delete(opp_util, to_remove, axis = 1)
-        
-        # remove from move list
-        for j in sorted(to_remove, reverse=True):
-            del my_valid_moves[j]
+    def remove_dom(self, my_util, opp_util):
+        """
+        Carry out iterated removal of dominated strategies.
+        my_util: Utility matrix for token in consideration
+        opp_util: Utility matrix for the opponent token, 
+        with its moves as rows
+        Returns masks of our moves and opp moves that survive
+        """
+        return iterated_dominance(my_util, opp_util, weak=self.weak_dominance)
 
-        return my_util, my_valid_moves, opp_util, has_change
 
-    def dominates(self, row1, row2):
-        dom = row1 > row2
-        return dom.all()
\ No newline at end of file
+class SearchTimeout(Exception):
+    """For when a lookahead iteration runs past the move's deadline."""
@@ -0,0 +1,45 @@
+"""
+Board symmetries of RoPaSci 360, for storing one representative of
+each class of equivalent positions in CedSam's caches.
+
+The rules are unchanged by mirroring each row (swapping the q and s axes,
+which keeps every hex in its row r), so a position and its mirror image
+are cached as one. Flipping r is a symmetry too, but only with Upper and
+Lower swapped, and a player's search only ever considers moving its own
+tokens, so a flipped node could never be looked up.
+"""
+
+from CedSam.hexes import HEXES, HEX_ID
+from CedSam.zobrist import PIECE_KEYS, STACK_KEYS, CONSIDER_KEYS, TARGET_KEYS
+
+IDENTITY, MIRROR = 0, 1
+
+# PERMS[transform][hex id] -> hex id; each transform is its own inverse
+PERMS = (
+    tuple(range(len(HEXES))),
+    tuple(HEX_ID[(r, -r - q)] for (r, q) in HEXES),
+)
+
+# MIRROR_KEYS[slot][hex id]: the piece key of the mirrored hex, so that
+# a position's mirror key (see BitBoard) is updated like its key, and 
+# MIRROR_STACK_KEYS[slot][hex id][count] likewise for the stack keys
+MIRROR_KEYS = tuple(tuple(keys[PERMS[MIRROR][hex_id]]
+                            for hex_id in range(len(HEXES)))
+                    for keys in PIECE_KEYS)
+MIRROR_STACK_KEYS = tuple(tuple(keys[PERMS[MIRROR][hex_id]]
+                                for hex_id in range(len(HEXES)))
+                            for keys in STACK_KEYS)
+
+def canonical_node(state, own, cur, index, opp):
+    """
+    Canonical form of a lookahead node: the position, plus our token in
+    slot `own` on hex cur playing against the token in slot `index` on
+    hex opp. Returns the transform and the node's canonical key.
+    """
+    key = state.key ^ CONSIDER_KEYS[own][cur] ^ TARGET_KEYS[index][opp]
+    perm = PERMS[MIRROR]
+    mirrored = state.mirror_key ^ CONSIDER_KEYS[own][perm[cur]] ^ \
+                TARGET_KEYS[index][perm[opp]]
+    if mirrored < key:
+        return MIRROR, mirrored
+    return IDENTITY, key
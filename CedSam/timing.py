@@ -0,0 +1,102 @@
+"""
+CPU time management across a game.
+
+The referee charges each player for the CPU time spent in its
+__init__, action and update calls, and ends the game once a player's
+total passes the limit. TimeManager keeps count of what we have used,
+and shares what is left between the turns the game is likely still to
+last, giving more to tactical positions and nothing to decided ones.
+"""
+
+from functools import wraps
+from time import process_time
+from CedSam.bitboard import ENEMY, AVOID
+from CedSam.distance import hex_distance
+from CedSam.hexes import hex_ids
+
+# the referee calls a draw after each player's 360th turn
+MAX_TURNS = 360
+
+
+def timed(method):
+    """
+    Counts the CPU time of a Player method against the player's clock
+    """
+    @wraps(method)
+    def wrapper(self, *args):
+        self.clock.start()
+        try:
+            return method(self, *args)
+        finally:
+            self.clock.stop()
+    return wrapper
+
+
+class TimeManager():
+
+    def __init__(self, limit=60.0):
+        # CPU seconds the referee allows us over the game
+        self.limit = limit
+        # fraction of the limit held back for overruns
+        self.reserve = 0.1
+        # turns a game goes on for, per token or throw left on either side
+        self.turns_per_token = 10
+        # budget multiplier when tokens are within reach of a fight
+        self.tactical = 3
+        self.used = 0.0
+        self.started = None
+
+    def start(self):
+        self.started = process_time()
+
+    def stop(self):
+        if self.started is not None:
+            self.used += process_time() - self.started
+            self.started = None
+
+    def left(self):
+        """
+        CPU seconds left to spend, less the reserve
+        """
+        return self.limit * (1 - self.reserve) - self.used
+
+    def turns_left(self, state, turn):
+        """
+        Estimate of the turns the game still has to run, from the
+        tokens and throws both sides have left
+        """
+        material = 18 - state.throws[0] - state.throws[1] + \
+                    state.tokens(0) + state.tokens(1)
+        return max(min(MAX_TURNS - turn, self.turns_per_token * material), 1)
+
+    def budget(self, state, side, turn):
+        """
+        CPU seconds to search the move of side (0 for Upper, 1 for
+        Lower) in state: nothing when the position is decided by one 
+        of its tokens being invincible (see BitBoard.invincible), and
+        more when any two opposing tokens are close enough to fight
+        """
+        left = self.left()
+        if left <= 0 or state.invincible(side):
+            return 0.0
+        share = left / self.turns_left(state, turn)
+        if self.is_tactical(state):
+            share *= self.tactical
+        return min(share, left / 4)
+
+    def is_tactical(self, state):
+        """
+        Whether some token is within 2 hexes of an opposing token that
+        it beats or is beaten by, so either could land on the other
+        by the end of the turn
+        """
+        masks = state.masks
+        for kind in range(3):
+            tokens = hex_ids(masks[kind])
+            if not tokens:
+                continue
+            rivals = hex_ids(masks[3 + ENEMY[kind]] | masks[3 + AVOID[kind]])
+            if any(hex_distance(token, rival) <= 2
+                    for token in tokens for rival in rivals):
+                return True
+        return False
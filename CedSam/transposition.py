@@ -0,0 +1,80 @@
+"""
+Bounded transposition table for CedSam's lookahead search.
+"""
+
+from collections import namedtuple
+
+# key: full 64-bit node key, to detect index collisions
+# depth: remaining search depth the value was computed with
+# age: search (turn) number the entry was stored in
+Entry = namedtuple('Entry', 'key depth age value move')
+
+
+class TranspositionTable():
+    """
+    Fixed-size table of solved lookahead nodes, keyed by Zobrist key.
+
+    Entries live in buckets of two. The first slot of a bucket prefers
+    depth: a new entry only replaces it if it was searched at least as
+    deep, or the old one is left over from an earlier search. Anything
+    else goes in the second slot, which always keeps the most recent
+    entry. The table never holds more than `size` entries.
+    """
+
+    def __init__(self, size=1 << 14):
+        self.buckets = max(size // 2, 1)
+        self.slots = [None] * (self.buckets * 2)
+        self.age = 0
+        self.hits = 0
+        self.misses = 0
+        self.total_hits = 0
+        self.total_misses = 0
+
+    def new_search(self):
+        """
+        Start a new search (turn): age existing entries and reset the
+        per-search counters
+        """
+        self.age += 1
+        self.total_hits += self.hits
+        self.total_misses += self.misses
+        self.hits = 0
+        self.misses = 0
+
+    def probe(self, key, depth):
+        """
+        Return the entry stored for key at this remaining depth,
+        or None if there is none
+        """
+        i = (key % self.buckets) * 2
+        for entry in (self.slots[i], self.slots[i + 1]):
+            if entry is not None and entry.key == key and entry.depth == depth:
+                self.hits += 1
+                return entry
+        self.misses += 1
+        return None
+
+    def store(self, key, depth, value, move):
+        slots = self.slots
+        i = (key % self.buckets) * 2
+        entry = Entry(key, depth, self.age, value, move)
+        first = slots[i]
+        if first is None or depth >= first.depth or first.age != self.age:
+            # keep the displaced entry in the recency slot, unless
+            # the new one replaces it
+            if first is not None and \
+                (first.key != key or first.depth != depth):
+                slots[i + 1] = first
+            slots[i] = entry
+        else:
+            slots[i + 1] = entry
+
+    def hit_rate(self):
+        """
+        Fraction of probes in the current search that found an entry
+        """
+        probes = self.hits + self.misses
+        return self.hits / probes if probes else 0.0
+
+    def __len__(self):
+        return sum(entry is not None for entry in self.slots)
@@ -0,0 +1,58 @@
+"""
+Zobrist keys for RoPaSci 360 positions.
+
+A position's key is the XOR of one random 64-bit number per occupied
+(mask slot, hex) pair (see CedSam.bitboard) and one per side for its
+throw count, so moving, throwing or removing a token updates the key
+with one or two XORs.
+"""
+
+from random import Random
+
+# fixed seed, so keys are stable between runs and processes
+_random = Random(360)
+
+# PIECE_KEYS[slot][hex id]
+PIECE_KEYS = tuple(tuple(_random.getrandbits(64) for _ in range(61)) 
+                    for _ in range(6))
+
+# THROW_KEYS[side][throws used], side 0 for Upper and 1 for Lower
+THROW_KEYS = tuple(tuple(_random.getrandbits(64) for _ in range(10)) 
+                    for _ in range(2))
+
+def position_key(masks, throws, pieces=PIECE_KEYS):
+    """
+    Compute the key of a position from scratch, 
+    with pieces as the (slot, hex) keys
+    """
+    key = THROW_KEYS[0][throws[0]] ^ THROW_KEYS[1][throws[1]]
+    for index, mask in enumerate(masks):
+        key ^= mask_key(index, mask, pieces)
+    return key
+
+def mask_key(index, mask, pieces=PIECE_KEYS):
+    """
+    XOR of the keys of every hex in a mask of one slot
+    """
+    key = 0
+    keys = pieces[index]
+    while mask:
+        low = mask & -mask
+        key ^= keys[low.bit_length() - 1]
+        mask ^= low
+    return key
+
+# keys marking which token a search node considers moving (by its slot
+# and hex) and which opponent token it plays against, so lookahead nodes
+# over the same position but different token pairs get different keys
+CONSIDER_KEYS = tuple(tuple(_random.getrandbits(64) for _ in range(61)) 
+                    for _ in range(6))
+TARGET_KEYS = tuple(tuple(_random.getrandbits(64) for _ in range(61)) 
+                    for _ in range(6))
+
+# STACK_KEYS[slot][hex id][count]: marks how many more tokens of a slot
+# are stacked on a hex holding one, as the masks only show the one
+STACK_KEYS = tuple(tuple((0,) + tuple(_random.getrandbits(64) 
+                                        for _ in range(8)) 
+                            for _ in range(61)) 
+                    for _ in range(6))
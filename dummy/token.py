@@ -1,48 +1,77 @@
-from CedSam.side import Upper
+from dummy.side import Upper
 from math import sqrt
 
+# hex tile coordinates, and the id each token stores its tile as
+SIZE = range(-4, +4+1)
+HEXES = tuple((r, q) for r in SIZE for q in SIZE if (-r - q) in SIZE)
+HEX_ID = {coord: i for i, coord in enumerate(HEXES)}
+
 class Token():
+    """
+    A token is just its side and the id of the hex it sits on; everything
+    else is a class attribute shared by every token of the same type.
+    Tokens compare and hash by value, so don't move a token while it is
+    a dict key or set member.
+    """
+
+    __slots__ = ('side', 'hex')
 
-    def __init__(self, name, side, r, q):
+    def __init__(self, side, r, q):
         self.side = side
-        self.name = name.upper() if side is Upper else name
-        self.r = r
-        self.q = q
+        self.hex = HEX_ID[(r, q)]
+
+    @property
+    def r(self):
+        return HEXES[self.hex][0]
+
+    @property
+    def q(self):
+        return HEXES[self.hex][1]
+
+    @property
+    def name(self):
+        return self.letter.upper() if self.side is Upper else self.letter
 
     # move token and print move to console
     def move(self, r, q):
-        self.r = r
-        self.q = q
+        self.hex = HEX_ID[(r, q)]
 
     # generate list of adjacent her tiles of current her tile
     def get_adj_hex(self, r, q):
         return [(r, q-1), (r-1, q), (r+1, q), 
                 (r, q+1), (r-1, q+1), (r+1, q-1)]
 
-    def hex_distance(self, a, b):
+    @staticmethod
+    def hex_distance(a, b):
         a_r, a_q = a
         b_r, b_q = b
         return (abs(a_q - b_q) + abs(a_q + a_r - b_q - b_r) + abs(a_r - b_r)) / 2
 
-    def euclidean_distance(self, a, b):
+    @staticmethod
+    def euclidean_distance(a, b):
         a_r, a_q = a
         b_r, b_q = b
         return sqrt((a_r - b_r)**2 + (a_q - b_q)**2 - ((a_r - b_r)*(a_q - b_q)))
 
+    def __eq__(self, other):
+        return type(self) is type(other) and \
+            self.side is other.side and self.hex == other.hex
+
+    def __hash__(self):
+        return hash((type(self), self.side, self.hex))
+
 class Rock(Token):
-    def __init__(self, side, r, q):
-        self.avoid = Paper
-        self.enemy = Scissors
-        super().__init__('r', side, r, q)
+    __slots__ = ()
+    letter = 'r'
 
 class Paper(Token):
-    def __init__(self, side, r, q):
-        self.avoid = Scissors
-        self.enemy = Rock
-        super().__init__('p', side, r, q)
+    __slots__ = ()
+    letter = 'p'
 
 class Scissors(Token):
-    def __init__(self, side, r, q):
-        self.avoid = Rock
-        self.enemy = Paper
-        super().__init__('s', side, r, q)
\ No newline at end of file
+    __slots__ = ()
+    letter = 's'
+
+Rock.avoid, Rock.enemy = Paper, Scissors
+Paper.avoid, Paper.enemy = Scissors, Rock
+Scissors.avoid, Scissors.enemy = Rock, Paper
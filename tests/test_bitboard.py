@@ -0,0 +1,46 @@
+import random
+from CedSam.bitboard import BitBoard
+from CedSam.hexes import HEX_ID, HEX_BIT
+from CedSam.side import Upper
+from CedSam.token import Rock
+
+
+def snapshot(state):
+    return (list(state.masks), list(state.throws), dict(state.stacks), 
+            state.key, state.mirror_key)
+
+
+def test_make_unmake_round_trip():
+    rng = random.Random(6)
+    state = BitBoard()
+    snapshots = [snapshot(state)]
+    for turn in range(2000):
+        # take a move back at random, and whenever the game is over
+        if snapshots[1:] and (rng.random() < 0.35 or 
+                                state.result() is not None):
+            state.unmake_move()
+            snapshots.pop()
+            assert snapshot(state) == snapshots[-1]
+        else:
+            state.make_move((rng.choice(state.actions(0)), 
+                                rng.choice(state.actions(1))))
+            snapshots.append(snapshot(state))
+        # the incremental keys match keys built from scratch
+        fresh = BitBoard(state.masks, state.throws, state.stacks)
+        assert (fresh.key, fresh.mirror_key) == (state.key, state.mirror_key)
+    while len(snapshots) > 1:
+        state.unmake_move()
+        snapshots.pop()
+        assert snapshot(state) == snapshots[-1]
+
+
+def test_token_leaves_stack():
+    stack, away = HEX_ID[(0, 1)], HEX_ID[(0, 2)]
+    state = BitBoard.from_tokens([Rock(Upper, 0, 1), Rock(Upper, 0, 1)])
+    before = snapshot(state)
+    state.make_move(((0, stack, away),))
+    assert state.masks[0] == HEX_BIT[stack] | HEX_BIT[away]
+    assert state.tokens(0) == 2
+    assert any(src == stack for (index, src, dst) in state.actions(0))
+    state.unmake_move()
+    assert snapshot(state) == before
@@ -0,0 +1,54 @@
+import numpy as np
+import pytest
+from CedSam.gametheory2 import solve_game, solve_game_lp
+
+FLAGS = [(maximiser, rowplayer) for maximiser in (True, False) 
+                                for rowplayer in (True, False)]
+
+
+def random_games(seed, count=1000):
+    """
+    Random 2xN and Mx2 games, many with small integer payoffs so that
+    ties and repeated rows and columns come up often
+    """
+    rng = np.random.default_rng(seed)
+    for k in range(count):
+        size = rng.integers(1, 6)
+        shape = (2, size) if k % 2 else (size, 2)
+        if k % 3:
+            yield rng.integers(-3, 4, size=shape).astype(float)
+        else:
+            yield rng.normal(size=shape) * 10
+
+
+def guaranteed(V, s, maximiser, rowplayer):
+    """
+    The value strategy s secures against every reply
+    """
+    W = V if rowplayer else V.T
+    payoffs = s @ W
+    return payoffs.min() if maximiser else payoffs.max()
+
+
+@pytest.mark.parametrize("maximiser, rowplayer", FLAGS)
+def test_closed_form_matches_lp(maximiser, rowplayer):
+    for V in random_games(seed=int(maximiser) * 2 + int(rowplayer)):
+        s, v = solve_game(V, maximiser=maximiser, rowplayer=rowplayer)
+        _, v_lp = solve_game_lp(V, maximiser=maximiser, rowplayer=rowplayer)
+        assert v == pytest.approx(v_lp, abs=1e-6)
+        assert s.sum() == pytest.approx(1)
+        assert (s >= -1e-9).all()
+        assert guaranteed(V, s, maximiser, rowplayer) == \
+                pytest.approx(v, abs=1e-6)
+
+
+def test_rock_paper_scissors():
+    s, v = solve_game([[0, -1, 1], [1, 0, -1], [-1, 1, 0]])
+    assert s == pytest.approx([1/3, 1/3, 1/3], abs=1e-6)
+    assert v == pytest.approx(0, abs=1e-6)
+
+
+def test_textbook_example():
+    s, v = solve_game([[3, 0], [-1, 1]], maximiser=False, rowplayer=False)
+    assert s == pytest.approx([1/5, 4/5])
+    assert v == pytest.approx(3/5)
@@ -0,0 +1,43 @@
+from CedSam.player import Player
+from CedSam.side import Upper, Lower
+from CedSam.token import Rock, Paper, Scissors
+
+
+def make_player():
+    """
+    A player searching a Scissors hunting a Paper, at a depth where
+    a fail-low search used to leave inexact values in the table
+    """
+    player = Player("upper")
+    player.depth_limit = 4
+    player.quiescence = 0
+    player.self_tokens = [Scissors(Upper, -1, -1), Rock(Upper, -1, 1)]
+    player.opponent_tokens = [Paper(Lower, 0, 4), Scissors(Lower, -1, 3)]
+    return player
+
+
+def search(player, **kwargs):
+    consider = player.self_tokens[0]
+    target = player.opponent_tokens[0]
+    value, move = player.lookahead(player.game_state(), consider, 
+                                    consider.hex, target, target.hex, 
+                                    depth=0, **kwargs)
+    return value
+
+
+def test_fail_low_search_leaves_table_exact():
+    true = search(make_player())
+
+    player = make_player()
+    assert search(player, alpha=true + 20) <= true + 20
+    assert search(player) == true
+
+
+def test_fail_low_search_is_a_bound():
+    true = search(make_player())
+    for alpha in (true - 20, true, true + 20):
+        value = search(make_player(), alpha=alpha)
+        if value > alpha:
+            assert value == true
+        else:
+            assert value <= true